@@ -1,25 +1,84 @@
 # anomaly_detector.py - ML model for detecting anomalies
 
-import pandas as pd
-import numpy as np
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
 import pickle
 import os
+import threading
 import config
+import storage
+from drift_monitor import build_reference
+from lazy import LazyModule
+
+# Heavy modules are imported on first use, not when the app starts
+np = LazyModule('numpy')
+sklearn_ensemble = LazyModule('sklearn.ensemble')
+sklearn_preprocessing = LazyModule('sklearn.preprocessing')
 
 class AnomalyDetector:
     def __init__(self):
         self.model = None
-        self.scaler = StandardScaler()
+        self.scaler = None  # Created when the model is trained or loaded
+        self.reference = None  # Training-time distributions, used for drift detection
         self.is_trained = False
+        self.model_status = 'not_loaded'  # not_loaded | loading | ready | missing | error
+        self._model_lock = storage.ReadWriteLock()  # Guards model/scaler swaps
+        self._load_done = threading.Event()  # Cleared while a background load runs
+        self._load_done.set()
+    
+    def __getstate__(self):
+        # Locks can't be pickled (e.g. when sent to worker processes)
+        state = self.__dict__.copy()
+        del state['_model_lock']
+        del state['_load_done']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._model_lock = storage.ReadWriteLock()
+        self._load_done = threading.Event()
+        self._load_done.set()
+    
+    def _snapshot(self):
+        """
+        Get a consistent (model, scaler) pair, even while another thread swaps them
+        """
+        with self._model_lock.read():
+            return self.model, self.scaler
+    
+    def _swap(self, model, scaler, reference=None):
+        """
+        Replace the model, scaler and reference distributions together
+        """
+        with self._model_lock.write():
+            self.model = model
+            self.scaler = scaler
+            self.reference = reference
+            self.is_trained = model is not None
+            self.model_status = 'ready' if model is not None else 'not_loaded'
+    
+    def copy(self):
+        """
+        New detector sharing the fitted model and scaler, with its own lock
+        """
+        # One locked read, so a concurrent retrain can't pair an old model with a new reference
+        with self._model_lock.read():
+            model, scaler, reference = self.model, self.scaler, self.reference
+        
+        detector = AnomalyDetector()
+        detector._swap(model, scaler, reference)
+        return detector
+    
+    def reset(self):
+        """
+        Forget the trained model
+        """
+        self._swap(None, None)
         
     def load_data(self, filename=config.DATA_FILE):
         """
         Load metrics data from CSV
         """
         try:
-            df = pd.read_csv(filename)
+            df = storage.read_csv(filename)
             print(f"✅ Loaded {len(df)} records from {filename}")
             return df
         except FileNotFoundError:
@@ -35,9 +94,10 @@ class AnomalyDetector:
         features = df[['cpu_usage', 'memory_usage', 'network_traffic']].copy()
         return features
     
-    def train_model(self, df):
+    def train_model(self, df, contamination=None):
         """
         Train the Isolation Forest model on the data
+        contamination overrides config.CONTAMINATION when given
         """
         print("\n🧠 Training anomaly detection model...")
         
@@ -45,17 +105,22 @@ class AnomalyDetector:
         features = self.prepare_features(df)
         
         # Normalize the data (makes ML work better)
-        features_scaled = self.scaler.fit_transform(features)
+        # Fit into new objects so requests keep using the old model until the swap
+        scaler = sklearn_preprocessing.StandardScaler()
+        features_scaled = scaler.fit_transform(features)
         
         # Create and train Isolation Forest model
-        self.model = IsolationForest(
-            contamination=config.CONTAMINATION,  # Expected % of anomalies
+        model = sklearn_ensemble.IsolationForest(
+            contamination=contamination or config.CONTAMINATION,  # Expected % of anomalies
             random_state=42,  # For reproducible results
             n_estimators=100  # Number of trees in the forest
         )
         
-        self.model.fit(features_scaled)
-        self.is_trained = True
+        model.fit(features_scaled)
+        
+        # Remember the training distributions of features and scores for drift detection
+        reference = build_reference(features, model.decision_function(features_scaled))
+        self._swap(model, scaler, reference)
         
         print("✅ Model training complete!")
         
@@ -72,12 +137,13 @@ class AnomalyDetector:
         
         # Prepare features
         features = self.prepare_features(df)
+        model, scaler = self._snapshot()
         
         # Normalize using the same scaler from training
-        features_scaled = self.scaler.transform(features)
+        features_scaled = scaler.transform(features)
         
         # Predict: -1 = anomaly, 1 = normal
-        predictions = self.model.predict(features_scaled)
+        predictions = model.predict(features_scaled)
         
         # Add predictions to dataframe
         df['anomaly'] = predictions
@@ -94,10 +160,29 @@ class AnomalyDetector:
         Get anomaly scores (lower score = more anomalous)
         """
         features = self.prepare_features(df)
-        features_scaled = self.scaler.transform(features)
+        model, scaler = self._snapshot()
+        features_scaled = scaler.transform(features)
         
         # Get anomaly scores
-        scores = self.model.decision_function(features_scaled)
+        scores = model.decision_function(features_scaled)
+        df['anomaly_score'] = scores
+        
+        return df
+    
+    def score(self, df):
+        """
+        Predict and score in a single pass, without logging
+        Returns a copy of the dataframe with anomaly, is_anomaly and anomaly_score columns
+        """
+        model, scaler = self._snapshot()
+        features_scaled = scaler.transform(self.prepare_features(df))
+        
+        # IsolationForest.predict is just decision_function < 0, so compute it once
+        scores = model.decision_function(features_scaled)
+        
+        df = df.copy()
+        df['anomaly'] = np.where(scores < 0, -1, 1)
+        df['is_anomaly'] = np.where(scores < 0, 'YES', 'NO')
         df['anomaly_score'] = scores
         
         return df
@@ -110,14 +195,16 @@ class AnomalyDetector:
             print("❌ Cannot save: Model not trained yet!")
             return
         
-        # Save both model and scaler
-        model_data = {
-            'model': self.model,
-            'scaler': self.scaler
-        }
+        # Save model, scaler and training distributions
+        with self._model_lock.read():
+            model_data = {
+                'model': self.model,
+                'scaler': self.scaler,
+                'reference': self.reference
+            }
         
-        with open(filename, 'wb') as f:
-            pickle.dump(model_data, f)
+        # Atomic replace so other workers never load a half-written model
+        storage.atomic_write(filename, lambda f: pickle.dump(model_data, f), mode='wb')
         
         print(f"✅ Model saved to {filename}")
     
@@ -129,14 +216,40 @@ class AnomalyDetector:
             with open(filename, 'rb') as f:
                 model_data = pickle.load(f)
             
-            self.model = model_data['model']
-            self.scaler = model_data['scaler']
-            self.is_trained = True
+            # Models saved before drift detection have no reference
+            self._swap(model_data['model'], model_data['scaler'], model_data.get('reference'))
             
             print(f"✅ Model loaded from {filename}")
         except FileNotFoundError:
+            self.model_status = 'missing'
             print(f"❌ Error: {filename} not found!")
     
+    def load_model_in_background(self, filename=config.MODEL_FILE):
+        """
+        Load the model on a background thread (sklearn import + unpickling are slow)
+        Use wait_until_loaded() before training or detecting
+        """
+        self.model_status = 'loading'
+        self._load_done.clear()
+        
+        def load():
+            try:
+                self.load_model(filename)
+            except Exception as e:
+                self.model_status = 'error'
+                print(f"❌ Error loading model: {e}")
+            finally:
+                self._load_done.set()
+        
+        threading.Thread(target=load, name='model-loader', daemon=True).start()
+    
+    def wait_until_loaded(self, timeout=None):
+        """
+        Block until any background model load has finished
+        Returns False if it is still loading after timeout seconds
+        """
+        return self._load_done.wait(timeout)
+    
     def display_anomalies(self, df):
         """
         Display all detected anomalies in a readable format
@@ -188,8 +301,8 @@ if __name__ == "__main__":
         detector.save_model()
         
         # Save results to new CSV
-        output_file = 'data/metrics_with_anomalies.csv'
-        df_with_scores.to_csv(output_file, index=False)
+        output_file = config.ANOMALIES_FILE
+        storage.write_csv(df_with_scores, output_file)
         print(f"\n✅ Results saved to {output_file}")
         
         # Show summary statistics
@@ -4,9 +4,14 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 from data_collector import DataCollector
 from anomaly_detector import AnomalyDetector
-import pandas as pd
+from retention_manager import RetentionManager
+from backtester import Backtester
+from drift_monitor import DriftMonitor
 import config
+import storage
+from response_format import dataframe_response, negotiate_format, UnsupportedFormat
 import os
+import multiprocessing
 from datetime import datetime
 
 app = Flask(__name__)
@@ -16,10 +21,27 @@ CORS(app)  # Enable CORS for all routes
 collector = DataCollector()
 detector = AnomalyDetector()
 
-# Try to load existing model if available
-if os.path.exists(config.MODEL_FILE):
-    detector.load_model()
-    print("✅ Loaded existing model")
+# Background compaction of old metrics and results
+retention = RetentionManager()
+
+# Watches incoming data for drift and retrains when it passes the threshold
+drift = DriftMonitor(detector)
+
+# Backtest workers started with spawn/forkserver re-import this file as
+# '__mp_main__' - they must not load the model or start background jobs
+if __name__ != '__mp_main__':
+    # Try to load existing model if available (in the background so startup stays fast)
+    if os.path.exists(config.MODEL_FILE):
+        if config.MODEL_LOAD_IN_BACKGROUND:
+            detector.load_model_in_background()
+        else:
+            detector.load_model()
+    
+    if config.RETENTION_ENABLED:
+        retention.start()
+    
+    if config.DRIFT_ENABLED:
+        drift.start()
 
 # ==================== API ROUTES ====================
 
@@ -38,9 +60,14 @@ def home():
             '/collect': 'Collect new metrics data',
             '/train': 'Train anomaly detection model',
             '/detect': 'Detect anomalies in collected data',
+            '/backtest': 'Rescore history in parallel partitions',
             '/status': 'Get current system status',
             '/anomalies': 'Get list of all detected anomalies',
             '/metrics': 'Get all collected metrics',
+            '/retention': 'Get retention settings and last compaction report',
+            '/retention/run': 'Run retention and compaction now',
+            '/drift': 'Get drift statistics for features and anomaly scores',
+            '/drift/check': 'Check for drift now (retrains if past the threshold)',
             '/clear': 'Clear all data (use with caution)'
         }
     })
@@ -53,7 +80,9 @@ def health():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'model_trained': detector.is_trained
+        'model_trained': detector.is_trained,
+        'model_status': detector.model_status,
+        'ready': detector.model_status != 'loading'
     })
 
 @app.route('/collect', methods=['POST'])
@@ -71,7 +100,14 @@ def collect_data():
             all_metrics.extend(metrics)
         
         # Save to CSV
-        collector.save_to_csv(all_metrics)
+        new_df = collector.save_to_csv(all_metrics)
+        
+        # Feed the drift monitor (no-op until a model is trained).
+        # The rows are already saved, so monitoring must never fail the collection.
+        try:
+            drift.observe(new_df)
+        except Exception as e:
+            print(f"❌ Drift monitor failed to observe new metrics: {e}")
         
         return jsonify({
             'status': 'success',
@@ -91,6 +127,9 @@ def train_model():
     Train the anomaly detection model
     """
     try:
+        # Don't let a pending background load overwrite the new model
+        detector.wait_until_loaded()
+        
         # Load data
         df = detector.load_data()
         
@@ -122,8 +161,12 @@ def train_model():
 def detect_anomalies():
     """
     Detect anomalies in the collected data
+    Supports ?format=records|columnar|arrow (or the Accept header) and gzip/zstd
     """
     try:
+        negotiate_format(request)  # Reject unknown formats before doing the work
+        detector.wait_until_loaded()
+        
         if not detector.is_trained:
             return jsonify({
                 'status': 'error',
@@ -144,20 +187,95 @@ def detect_anomalies():
         df_with_scores = detector.get_anomaly_score(df_with_anomalies)
         
         # Save results
-        output_file = 'data/metrics_with_anomalies.csv'
-        df_with_scores.to_csv(output_file, index=False)
+        output_file = config.ANOMALIES_FILE
+        storage.write_csv(df_with_scores, output_file)
         
         # Get anomalies
         anomalies = df_with_scores[df_with_scores['anomaly'] == -1]
         
-        return jsonify({
+        return dataframe_response(anomalies, 'anomalies', {
             'status': 'success',
             'message': f'Analysis complete',
             'total_records': len(df_with_scores),
-            'anomalies_found': len(anomalies),
-            'anomalies': anomalies.to_dict('records')
+            'anomalies_found': len(anomalies)
+        }, request)
+    
+    except UnsupportedFormat as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 406
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@app.route('/backtest', methods=['POST'])
+def run_backtest():
+    """
+    Rescore the full history in parallel partitions
+    """
+    try:
+        detector.wait_until_loaded()
+        
+        params = request.get_json(silent=True) or {}
+        partition_by = params.get('partition_by', config.BACKTEST_PARTITION)
+        freq = params.get('freq', config.BACKTEST_FREQ)
+        workers = params.get('workers')
+        contamination = params.get('contamination')
+        retrain = params.get('retrain', False) or contamination is not None
+        
+        if workers is not None:
+            try:
+                workers = int(workers)
+            except (TypeError, ValueError):
+                raise ValueError(f"workers must be an integer, got {workers!r}")
+            if workers < 1:
+                raise ValueError('workers must be at least 1')
+        
+        # Load data
+        df = detector.load_data()
+        
+        if df is None or len(df) == 0:
+            return jsonify({
+                'status': 'error',
+                'message': 'No data available to backtest'
+            }), 400
+        
+        # Retrain into a separate detector so the live model is left untouched
+        if retrain:
+            backtest_detector = AnomalyDetector()
+            backtest_detector.train_model(df, contamination=contamination)
+        elif detector.is_trained:
+            backtest_detector = detector
+        else:
+            return jsonify({
+                'status': 'error',
+                'message': 'Model not trained yet. Train the model first or pass retrain=true'
+            }), 400
+        
+        # Don't fork this process: it runs the retention, drift, csv-writer and
+        # request threads, and a fork would copy any locks they hold. forkserver
+        # workers start from a clean process and get the model once each.
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        summary, partitions = Backtester(backtest_detector).run(
+            df, partition_by=partition_by, freq=freq, workers=workers, start_method=start_method)
+        
+        return jsonify({
+            'status': 'success',
+            'message': f"Backtest complete over {summary['partitions']} partitions",
+            'summary': summary,
+            'partitions': partitions
         })
     
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -175,7 +293,7 @@ def get_status():
         num_records = 0
         
         if data_exists:
-            df = pd.read_csv(config.DATA_FILE)
+            df = storage.read_csv(config.DATA_FILE)
             num_records = len(df)
         
         # Check if model exists
@@ -187,6 +305,7 @@ def get_status():
                 'data_collected': data_exists,
                 'total_records': num_records,
                 'model_trained': detector.is_trained,
+                'model_status': detector.model_status,
                 'model_file_exists': model_exists,
                 'simulation_mode': config.SIMULATION_MODE,
                 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -203,9 +322,10 @@ def get_status():
 def get_anomalies():
     """
     Get all detected anomalies
+    Supports ?format=records|columnar|arrow (or the Accept header) and gzip/zstd
     """
     try:
-        output_file = 'data/metrics_with_anomalies.csv'
+        output_file = config.ANOMALIES_FILE
         
         if not os.path.exists(output_file):
             return jsonify({
@@ -213,14 +333,19 @@ def get_anomalies():
                 'message': 'No anomaly detection results found. Run /detect first'
             }), 404
         
-        df = pd.read_csv(output_file)
+        df = storage.read_csv(output_file)
         anomalies = df[df['anomaly'] == -1]
         
-        return jsonify({
+        return dataframe_response(anomalies, 'anomalies', {
             'status': 'success',
-            'total_anomalies': len(anomalies),
-            'anomalies': anomalies.to_dict('records')
-        })
+            'total_anomalies': len(anomalies)
+        }, request)
+    
+    except UnsupportedFormat as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 406
     
     except Exception as e:
         return jsonify({
@@ -232,6 +357,7 @@ def get_anomalies():
 def get_metrics():
     """
     Get all collected metrics
+    Supports ?format=records|columnar|arrow (or the Accept header) and gzip/zstd
     """
     try:
         if not os.path.exists(config.DATA_FILE):
@@ -240,12 +366,87 @@ def get_metrics():
                 'message': 'No data collected yet. Use /collect first'
             }), 404
         
-        df = pd.read_csv(config.DATA_FILE)
+        df = storage.read_csv(config.DATA_FILE)
+        
+        return dataframe_response(df, 'metrics', {
+            'status': 'success',
+            'total_records': len(df)
+        }, request)
+    
+    except UnsupportedFormat as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 406
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@app.route('/retention')
+def get_retention():
+    """
+    Get retention settings and the last compaction report
+    """
+    return jsonify({
+        'status': 'success',
+        'settings': retention.get_settings(),
+        'last_report': retention.last_report
+    })
+
+@app.route('/retention/run', methods=['POST'])
+def run_retention():
+    """
+    Run retention and compaction now
+    """
+    try:
+        report = retention.run()
         
         return jsonify({
             'status': 'success',
-            'total_records': len(df),
-            'metrics': df.to_dict('records')
+            'message': f"Compacted {report['raw_records_compacted']} records, reclaimed {report['bytes_reclaimed']} bytes",
+            'report': report
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@app.route('/drift')
+def get_drift():
+    """
+    Get drift statistics for features and anomaly scores
+    """
+    try:
+        return jsonify({
+            'status': 'success',
+            'drift': drift.get_summary()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@app.route('/drift/check', methods=['POST'])
+def check_drift():
+    """
+    Check for drift now, retraining if it passes the threshold
+    """
+    try:
+        detector.wait_until_loaded()
+        stats = drift.check()
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Drift detected - model retrained' if stats['retrained'] else
+                       ('Drift detected' if stats['drifted'] else 'No drift detected'),
+            'drift': stats
         })
     
     except Exception as e:
@@ -260,20 +461,21 @@ def clear_data():
     Clear all data and model (use with caution!)
     """
     try:
+        detector.wait_until_loaded()
+        
         # Remove data files
-        if os.path.exists(config.DATA_FILE):
-            os.remove(config.DATA_FILE)
+        storage.remove(config.DATA_FILE)
+        storage.remove(config.ANOMALIES_FILE)
         
-        if os.path.exists('data/metrics_with_anomalies.csv'):
-            os.remove('data/metrics_with_anomalies.csv')
+        # Remove compacted history
+        for aggregate_file in [config.HOURLY_FILE, config.DAILY_FILE, config.RETENTION_WATERMARK_FILE]:
+            storage.remove(aggregate_file)
         
         # Remove model
-        if os.path.exists(config.MODEL_FILE):
-            os.remove(config.MODEL_FILE)
+        storage.remove(config.MODEL_FILE)
         
         # Reset detector
-        detector.model = None
-        detector.is_trained = False
+        detector.reset()
         
         return jsonify({
             'status': 'success',
@@ -294,7 +496,7 @@ if __name__ == '__main__':
     print("="*50)
     print(f"📡 Server will run at: http://127.0.0.1:5000")
     print(f"📊 Simulation Mode: {config.SIMULATION_MODE}")
-    print(f"🤖 Model Loaded: {detector.is_trained}")
+    print(f"🤖 Model: {detector.model_status}")
     print("="*50 + "\n")
     
     app.run(debug=True, port=5000)
\ No newline at end of file
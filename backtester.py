@@ -0,0 +1,223 @@
+# backtester.py - Parallel rescoring of metrics history for backtests
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+import config
+import storage
+from anomaly_detector import AnomalyDetector
+from lazy import LazyModule
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+LABEL_COLUMN = 'simulated_anomaly'
+
+# State shared with pool workers. With fork, the detector and history are set in the
+# parent just before the pool is created, so workers inherit them copy-on-write and
+# tasks only carry row positions. Otherwise the initializer receives the detector once
+# per worker and each task carries just its own partition's rows.
+_shared = {}
+
+# Held for a fork pool's whole lifetime, so concurrent runs can't swap _shared under it
+_shared_lock = threading.Lock()
+
+def _init_worker(detector):
+    """
+    Pool initializer for non-fork start methods - receives the model once per worker
+    """
+    _shared['detector'] = detector
+
+def _score_forked(task):
+    """
+    Pool entry point (fork) - scores a partition of the inherited history
+    """
+    key, positions, output_dir = task
+    return _score_partition(_shared['detector'], key, _shared['df'].iloc[positions], output_dir)
+
+def _score_sent(task):
+    """
+    Pool entry point (forkserver / spawn) - scores the partition sent with the task
+    """
+    key, part, output_dir = task
+    return _score_partition(_shared['detector'], key, part, output_dir)
+
+def _score_partition(detector, key, part, output_dir):
+    """
+    Score one partition and write its results
+    """
+    start = time.perf_counter()
+    scored = detector.score(part)
+    elapsed = time.perf_counter() - start
+
+    filename = os.path.join(output_dir, f"partition_{re.sub(r'[^A-Za-z0-9_-]', '_', key)}.csv")
+    # Partition files are private to this task - no lock needed
+    storage.atomic_write(filename, lambda f: scored.to_csv(f, index=False))
+
+    result = {
+        'partition': key,
+        'file': filename,
+        'records': len(scored),
+        'anomalies_found': int((scored['anomaly'] == -1).sum()),
+        'seconds': round(elapsed, 4)
+    }
+
+    # Confusion counts against the simulator's ground-truth labels (if present)
+    if LABEL_COLUMN in scored.columns:
+        labeled = scored[scored[LABEL_COLUMN].notna()]
+        predicted = labeled['anomaly'] == -1
+        actual = labeled[LABEL_COLUMN].astype(int) == 1
+        result['true_positives'] = int((predicted & actual).sum())
+        result['false_positives'] = int((predicted & ~actual).sum())
+        result['false_negatives'] = int((~predicted & actual).sum())
+        result['labeled_records'] = len(labeled)
+
+    return result
+
+class Backtester:
+    def __init__(self, detector, output_dir=config.BACKTEST_DIR):
+        self.detector = detector
+        self.output_dir = output_dir
+
+    def partition(self, df, partition_by=config.BACKTEST_PARTITION, freq=config.BACKTEST_FREQ):
+        """
+        Split history into partitions by time bucket or by instance
+        Returns a list of (key, row positions)
+        """
+        if partition_by == 'instance':
+            keys = df['instance_id'].astype(str)
+        elif partition_by == 'time':
+            keys = pd.to_datetime(df['timestamp']).dt.floor(freq).dt.strftime('%Y-%m-%d_%H%M')
+        else:
+            raise ValueError(f"Unknown partition type '{partition_by}' (use 'time' or 'instance')")
+
+        groups = pd.Series(np.arange(len(df))).groupby(keys.to_numpy())
+        return [(str(key), positions.to_numpy()) for key, positions in groups]
+
+    def run(self, df, partition_by=config.BACKTEST_PARTITION, freq=config.BACKTEST_FREQ, workers=None,
+            start_method=None):
+        """
+        Score every partition in parallel and return a summary report
+        Results go to a new run directory under output_dir (summary['output_dir']).
+        start_method picks the multiprocessing start method; the default is fork
+        where available. Long-running servers should pass 'forkserver' (see app.py).
+        """
+        if not self.detector.is_trained:
+            raise ValueError('Model not trained yet')
+
+        available = multiprocessing.get_all_start_methods()
+        start_method = start_method or ('fork' if 'fork' in available else 'spawn')
+        if start_method not in available:
+            raise ValueError(f"Start method '{start_method}' not available (use {', '.join(available)})")
+
+        workers = workers or os.cpu_count() or 1
+
+        # Each run writes to its own directory, so runs never mix or overwrite results
+        run_dir = os.path.join(self.output_dir,
+                               f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(run_dir)
+
+        # Workers get their own detector so no lock held in the parent is inherited by a fork
+        detector = self.detector.copy()
+        df = df.reset_index(drop=True)
+        partitions = self.partition(df, partition_by, freq)
+
+        start = time.perf_counter()
+        if workers == 1 or len(partitions) <= 1:
+            results = [_score_partition(detector, key, df.iloc[positions], run_dir)
+                       for key, positions in partitions]
+        elif start_method == 'fork':
+            with _shared_lock:
+                _shared.update(detector=detector, df=df)
+                try:
+                    with multiprocessing.get_context('fork').Pool(workers) as pool:
+                        results = pool.map(_score_forked, [(key, positions, run_dir)
+                                                           for key, positions in partitions])
+                finally:
+                    _shared.clear()
+        else:
+            context = multiprocessing.get_context(start_method)
+            if start_method == 'forkserver':
+                # Start the server from this module only, not from the caller's __main__
+                context.set_forkserver_preload(['backtester'])
+            # Each partition's rows are pickled once, to the worker that scores them
+            tasks = [(key, df.iloc[positions], run_dir) for key, positions in partitions]
+            with context.Pool(workers, initializer=_init_worker, initargs=(detector,)) as pool:
+                results = pool.map(_score_sent, tasks)
+        elapsed = time.perf_counter() - start
+
+        summary = self.summarize(results, elapsed)
+        summary.update({
+            'partition_by': partition_by,
+            'freq': freq if partition_by == 'time' else None,
+            'workers': workers,
+            'start_method': start_method if workers > 1 and len(partitions) > 1 else None,
+            'output_dir': run_dir
+        })
+
+        report = {'summary': summary, 'partitions': results}
+        storage.atomic_write(os.path.join(run_dir, 'summary.json'), lambda f: json.dump(report, f, indent=2))
+
+        return summary, results
+
+    def summarize(self, results, elapsed):
+        """
+        Combine per-partition results into totals, precision/recall and throughput
+        """
+        total = sum(r['records'] for r in results)
+        summary = {
+            'partitions': len(results),
+            'total_records': total,
+            'anomalies_found': sum(r['anomalies_found'] for r in results),
+            'seconds': round(elapsed, 4),
+            'records_per_second': round(total / elapsed, 1) if elapsed > 0 else None,
+            'precision': None,
+            'recall': None
+        }
+
+        labeled = [r for r in results if 'labeled_records' in r]
+        if labeled and sum(r['labeled_records'] for r in labeled) > 0:
+            tp = sum(r['true_positives'] for r in labeled)
+            fp = sum(r['false_positives'] for r in labeled)
+            fn = sum(r['false_negatives'] for r in labeled)
+            summary['labeled_records'] = sum(r['labeled_records'] for r in labeled)
+            summary['precision'] = round(tp / (tp + fp), 4) if tp + fp else None
+            summary['recall'] = round(tp / (tp + fn), 4) if tp + fn else None
+
+        return summary
+
+# Run a backtest from the command line
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Rescore metrics history in parallel partitions')
+    parser.add_argument('--partition', choices=['time', 'instance'], default=config.BACKTEST_PARTITION)
+    parser.add_argument('--freq', default=config.BACKTEST_FREQ, help="Time partition size, e.g. 'D', 'W', 'h'")
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--retrain', action='store_true', help='Train a fresh model on the history first')
+    parser.add_argument('--contamination', type=float, default=None, help='Override CONTAMINATION when retraining')
+    parser.add_argument('--output-dir', default=config.BACKTEST_DIR)
+    args = parser.parse_args()
+
+    print("🧪 Running backtest...")
+
+    detector = AnomalyDetector()
+    df = detector.load_data()
+
+    if df is not None:
+        if args.retrain or args.contamination is not None:
+            detector.train_model(df, contamination=args.contamination)
+        else:
+            detector.load_model()
+
+        if detector.is_trained:
+            summary, results = Backtester(detector, args.output_dir).run(
+                df, partition_by=args.partition, freq=args.freq, workers=args.workers)
+
+            print("\n📊 Backtest Summary:")
+            for key, value in summary.items():
+                print(f"   {key}: {value}")
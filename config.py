@@ -52,4 +52,44 @@ LOG_FILE = 'logs/app.log'
 
 # Simulation Settings (for testing without GCP)
 SIMULATION_MODE = False  # Set to False when using real GCP
-NUM_SIMULATED_INSTANCES = 3  # Number of fake cloud instances to simulate
\ No newline at end of file
+NUM_SIMULATED_INSTANCES = 3  # Number of fake cloud instances to simulate
+
+# Detection Results
+ANOMALIES_FILE = 'data/metrics_with_anomalies.csv'
+
+# Retention Settings
+RETENTION_ENABLED = True  # Run the background retention job from app.py
+RETENTION_INTERVAL = 3600  # Run compaction every hour (seconds)
+RAW_RETENTION_HOURS = 24 * 7  # Keep raw samples (and detector results) for 7 days
+HOURLY_RETENTION_DAYS = 30  # Keep hourly aggregates for 30 days
+DAILY_RETENTION_DAYS = 365  # Keep daily aggregates for 1 year
+HOURLY_FILE = 'data/metrics_hourly.csv'
+DAILY_FILE = 'data/metrics_daily.csv'
+RETENTION_WATERMARK_FILE = 'data/retention_watermark.json'  # Tracks what is already compacted
+
+# Backtest Settings
+BACKTEST_DIR = 'data/backtest'  # Per-partition results are written here
+BACKTEST_PARTITION = 'time'  # 'time' or 'instance'
+BACKTEST_FREQ = 'D'  # Time partition size (pandas frequency, e.g. 'D', 'W', 'h')
+
+# Write Coordination Settings
+GROUP_COMMIT_WINDOW = 0.005  # Seconds the writer waits to batch concurrent appends into one fsync
+
+# Startup Settings
+MODEL_LOAD_IN_BACKGROUND = True  # Load the saved model on a background thread at startup
+
+# Response Settings
+COMPRESSION_MIN_BYTES = 1024  # Don't compress responses smaller than this
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3  # Used when the client accepts zstd and zstandard is installed
+
+# Drift Detection Settings
+DRIFT_ENABLED = True  # Run the background drift check from app.py
+DRIFT_AUTO_RETRAIN = True  # Retrain automatically when drift passes the threshold
+DRIFT_CHECK_INTERVAL = 300  # Check for drift every 5 minutes (seconds)
+DRIFT_PSI_THRESHOLD = 0.2  # Population Stability Index above this = drift
+DRIFT_BINS = 10  # Histogram bins per feature (quantiles of the training data)
+DRIFT_DECAY = 0.999  # Per-sample decay of the live sketches (~1000 sample window)
+DRIFT_MIN_SAMPLES = 300  # Don't judge drift on fewer (effective) samples - PSI is noisy on small samples
+DRIFT_RETRAIN_COOLDOWN = 3600  # Minimum seconds between automatic retrains
+DRIFT_RETRAIN_SAMPLES = round(1 / (1 - DRIFT_DECAY))  # Retrain on the most recent samples (the sketch window)
@@ -2,9 +2,12 @@
 
 import random
 import time
-import pandas as pd
 from datetime import datetime, timedelta, timezone
 import config
+import storage
+from lazy import LazyModule
+
+pd = LazyModule('pandas')
 
 class DataCollector:
     def __init__(self):
@@ -12,26 +15,36 @@ class DataCollector:
         self.num_instances = config.NUM_SIMULATED_INSTANCES
         self.use_aws = config.USE_AWS
         
-        # Initialize AWS clients if needed
-        if self.use_aws and not self.simulation_mode:
-            try:
-                import boto3
-                self.ec2_client = boto3.client(
-                    'ec2',
-                    aws_access_key_id=config.AWS_ACCESS_KEY_ID,
-                    aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
-                    region_name=config.AWS_REGION
-                )
-                self.cloudwatch_client = boto3.client(
-                    'cloudwatch',
-                    aws_access_key_id=config.AWS_ACCESS_KEY_ID,
-                    aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
-                    region_name=config.AWS_REGION
-                )
-                print("✅ AWS clients initialized successfully")
-            except Exception as e:
-                print(f"❌ Error initializing AWS clients: {e}")
-                self.simulation_mode = True  # Fallback to simulation
+        # AWS clients are created on first collection (boto3 is slow to import)
+        self.ec2_client = None
+        self.cloudwatch_client = None
+    
+    def _init_aws_clients(self):
+        """
+        Create the boto3 clients, falling back to simulation if that fails
+        """
+        if self.ec2_client is not None:
+            return
+        
+        try:
+            import boto3
+            self.ec2_client = boto3.client(
+                'ec2',
+                aws_access_key_id=config.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
+                region_name=config.AWS_REGION
+            )
+            self.cloudwatch_client = boto3.client(
+                'cloudwatch',
+                aws_access_key_id=config.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
+                region_name=config.AWS_REGION
+            )
+            print("✅ AWS clients initialized successfully")
+        except Exception as e:
+            print(f"❌ Error initializing AWS clients: {e}")
+            self.ec2_client = None
+            self.simulation_mode = True  # Fallback to simulation
         
     def simulate_metric_data(self):
         """
@@ -47,7 +60,8 @@ class DataCollector:
             network = random.uniform(100, 500)
             
             # Randomly inject anomalies (10% chance)
-            if random.random() < 0.1:
+            injected = random.random() < 0.1
+            if injected:
                 anomaly_type = random.choice(['cpu', 'memory', 'network'])
                 if anomaly_type == 'cpu':
                     cpu = random.uniform(85, 99)  # CPU spike!
@@ -61,7 +75,8 @@ class DataCollector:
                 'instance_id': f'instance-{instance_id}',
                 'cpu_usage': round(cpu, 2),
                 'memory_usage': round(memory, 2),
-                'network_traffic': round(network, 2)
+                'network_traffic': round(network, 2),
+                'simulated_anomaly': int(injected)  # Ground-truth label for backtests
             }
             metrics.append(metric)
         
@@ -168,7 +183,8 @@ class DataCollector:
                 'instance_id': instance['name'],
                 'cpu_usage': round(cpu, 2),
                 'memory_usage': round(memory, 2),
-                'network_traffic': round(network, 2)
+                'network_traffic': round(network, 2),
+                'simulated_anomaly': None  # No ground truth for real data (empty in the CSV)
             }
             metrics.append(metric)
             
@@ -180,6 +196,9 @@ class DataCollector:
         """
         Main method to collect data (simulated or real)
         """
+        if self.use_aws and not self.simulation_mode:
+            self._init_aws_clients()
+        
         if self.simulation_mode:
             print("🎮 Simulation mode - generating fake data")
             return self.simulate_metric_data()
@@ -193,17 +212,10 @@ class DataCollector:
     def save_to_csv(self, metrics, filename=config.DATA_FILE):
         """
         Saves collected metrics to CSV file
+        Rows are appended through the shared writer (creates the file if needed)
         """
         df = pd.DataFrame(metrics)
-        
-        # If file exists, append. Otherwise create new file
-        try:
-            existing_df = pd.read_csv(filename)
-            df = pd.concat([existing_df, df], ignore_index=True)
-        except FileNotFoundError:
-            pass  # File doesn't exist yet, will create new
-        
-        df.to_csv(filename, index=False)
+        storage.append_csv(df, filename)
         print(f"✅ Saved {len(metrics)} metrics to {filename}")
         return df
 
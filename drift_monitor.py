@@ -0,0 +1,262 @@
+# drift_monitor.py - Detects distribution drift and triggers automatic retraining
+
+import threading
+import time
+from datetime import datetime
+import config
+from lazy import LazyModule
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+FEATURES = ['cpu_usage', 'memory_usage', 'network_traffic']
+SCORE = 'anomaly_score'
+EPSILON = 1e-4  # Smoothing for empty bins in the PSI calculation
+
+class Histogram:
+    """
+    Streaming histogram over fixed bin edges (plus under/overflow bins).
+    Old observations decay so the sketch follows recent behaviour.
+    """
+    def __init__(self, edges, decay=1.0):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) + 1)
+        self.decay = decay
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+
+        # Per-sample decay, so the window doesn't depend on batch size
+        self.counts *= self.decay ** len(values)
+        self.counts += np.bincount(np.searchsorted(self.edges, values, side='right'),
+                                   minlength=len(self.counts))
+
+    @property
+    def total(self):
+        return float(self.counts.sum())
+
+    def proportions(self):
+        total = self.total
+        return self.counts / total if total > 0 else self.counts
+
+def build_reference(features, scores, bins=config.DRIFT_BINS):
+    """
+    Training-time distributions saved with the model: quantile bin edges and
+    the proportion of training samples in each bin, per feature and for the scores
+    """
+    columns = {name: features[name].to_numpy(dtype=float) for name in FEATURES}
+    columns[SCORE] = np.asarray(scores, dtype=float)
+
+    reference = {}
+    for name, values in columns.items():
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        histogram = Histogram(edges)
+        histogram.update(values)
+        reference[name] = {
+            'edges': edges.tolist(),
+            'proportions': histogram.proportions().tolist(),
+            'mean': float(values.mean())
+        }
+    return reference
+
+def psi(expected, actual):
+    """
+    Population Stability Index between two bin distributions
+    (< 0.1 stable, 0.1-0.2 moderate shift, > 0.2 significant drift)
+    """
+    expected = np.clip(np.asarray(expected, dtype=float), EPSILON, None)
+    actual = np.clip(np.asarray(actual, dtype=float), EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+class DriftMonitor:
+    def __init__(self, detector):
+        self.detector = detector
+        self.threshold = config.DRIFT_PSI_THRESHOLD
+        self.min_samples = config.DRIFT_MIN_SAMPLES
+        self.interval = config.DRIFT_CHECK_INTERVAL
+        self.cooldown = config.DRIFT_RETRAIN_COOLDOWN
+        self.auto_retrain = config.DRIFT_AUTO_RETRAIN
+
+        self.last_check = None
+        self.last_retrain = None
+        self.retrain_count = 0
+        self.retraining = False
+        self._last_retrain_time = None
+
+        self._reference = None
+        self._sketches = {}
+        self._means = {}
+        self._lock = threading.Lock()  # Guards sketches
+        self._retrain_lock = threading.Lock()  # Only one retrain at a time
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _sync_reference(self):
+        """
+        Start fresh sketches whenever the detector's model (and reference) changes
+        """
+        reference = self.detector.reference
+        if reference is self._reference:
+            return
+
+        self._reference = reference
+        self._sketches = {}
+        self._means = {}
+        if reference is not None:
+            for name, ref in reference.items():
+                self._sketches[name] = Histogram(ref['edges'], decay=config.DRIFT_DECAY)
+
+    def observe(self, df):
+        """
+        Add newly collected samples (and their anomaly scores) to the sketches
+        """
+        if not self.detector.is_trained or df is None or len(df) == 0:
+            return
+
+        scored = self.detector.score(df)
+
+        with self._lock:
+            self._sync_reference()
+            if not self._sketches:
+                return
+
+            for name in FEATURES + [SCORE]:
+                values = scored[name].to_numpy(dtype=float)
+                self._sketches[name].update(values)
+                # Exponentially weighted mean, matching the sketch decay
+                weight = config.DRIFT_DECAY ** len(values)
+                previous = self._means.get(name, values.mean())
+                self._means[name] = previous * weight + values.mean() * (1 - weight)
+
+    def get_stats(self):
+        """
+        Current drift statistics for every feature and the anomaly score
+        """
+        with self._lock:
+            self._sync_reference()
+
+            if self._reference is None:
+                status = 'no_model' if not self.detector.is_trained else 'no_reference'
+                return {'status': status, 'drifted': False, 'features': {}}
+
+            samples = min(sketch.total for sketch in self._sketches.values())
+            features = {}
+            for name, ref in self._reference.items():
+                sketch = self._sketches[name]
+                features[name] = {
+                    'psi': round(psi(ref['proportions'], sketch.proportions()), 4) if sketch.total else None,
+                    'reference_mean': round(ref['mean'], 4),
+                    'current_mean': round(self._means[name], 4) if name in self._means else None
+                }
+
+        enough_data = samples >= self.min_samples
+        max_psi = max((f['psi'] for f in features.values() if f['psi'] is not None), default=0.0)
+        return {
+            'status': 'monitoring' if enough_data else 'warming_up',
+            'drifted': enough_data and max_psi > self.threshold,
+            'max_psi': max_psi,
+            'threshold': self.threshold,
+            'effective_samples': round(samples, 1),
+            'min_samples': self.min_samples,
+            'features': features
+        }
+
+    def retrain(self):
+        """
+        Retrain on the most recent samples, save the model and reset the sketches.
+        Only the sketch window is used: training on the whole history would keep
+        the old distribution in the reference and flag the same drift again.
+        """
+        if not self._retrain_lock.acquire(blocking=False):
+            return False  # Already retraining
+
+        try:
+            self.retraining = True
+            self.detector.wait_until_loaded()
+
+            df = self.detector.load_data()
+            if df is None or len(df) == 0:
+                return False
+
+            order = pd.to_datetime(df['timestamp']).argsort(kind='stable')
+            df = df.iloc[order].tail(config.DRIFT_RETRAIN_SAMPLES)
+
+            # Trains into new objects and swaps them in; requests keep scoring meanwhile
+            self.detector.train_model(df)
+            self.detector.save_model()
+
+            self.last_retrain = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self._last_retrain_time = time.time()
+            self.retrain_count += 1
+            return True
+        finally:
+            self.retraining = False
+            self._retrain_lock.release()
+
+    def check(self):
+        """
+        Compare the sketches to the training distributions and retrain if drift
+        is past the threshold (and the cooldown since the last retrain has passed)
+        """
+        stats = self.get_stats()
+        self.last_check = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        stats['retrained'] = False
+        if stats['drifted'] and self.auto_retrain:
+            cooled_down = (self._last_retrain_time is None or
+                           time.time() - self._last_retrain_time >= self.cooldown)
+            if cooled_down:
+                print(f"📉 Drift detected (max PSI {stats['max_psi']}) - retraining model")
+                stats['retrained'] = self.retrain()
+
+        return stats
+
+    def _loop(self):
+        """
+        Background loop - checks for drift every interval until stopped
+        """
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"❌ Drift check failed: {e}")
+
+    def start(self):
+        """
+        Start the background drift check (daemon thread)
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name='drift-monitor', daemon=True)
+        self._thread.start()
+        print(f"✅ Drift monitor started (every {self.interval}s)")
+
+    def stop(self):
+        """
+        Stop the background drift check
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get_summary(self):
+        """
+        Drift statistics plus monitor state, for the API
+        """
+        summary = self.get_stats()
+        summary.update({
+            'auto_retrain': self.auto_retrain,
+            'retraining': self.retraining,
+            'retrain_count': self.retrain_count,
+            'last_check': self.last_check,
+            'last_retrain': self.last_retrain,
+            'check_interval_seconds': self.interval,
+            'running': self._thread is not None and self._thread.is_alive()
+        })
+        return summary
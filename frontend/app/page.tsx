@@ -7,6 +7,7 @@ import ActionPanel from "@/components/action-panel"
 import StatisticsGrid from "@/components/statistics-grid"
 import ChartsSection from "@/components/charts-section"
 import AnomaliesSection from "@/components/anomalies-section"
+import { fetchColumnar } from "@/lib/columnar"
 
 interface SystemStatus {
   status: string
@@ -50,10 +51,9 @@ export default function Dashboard() {
 
 const fetchMetrics = async () => {
   try {
-    const response = await fetch(`${API_BASE}/metrics`)
-    const result = await response.json()
+    const result = await fetchColumnar<Metric>(`${API_BASE}/metrics`, "metrics")
     if (result.status === 'success') {
-      setMetrics(result.metrics || [])
+      setMetrics(result.rows)
     }
   } catch (error) {
     console.error("Failed to fetch metrics:", error)
@@ -62,10 +62,9 @@ const fetchMetrics = async () => {
 
 const fetchAnomalies = async () => {
   try {
-    const response = await fetch(`${API_BASE}/anomalies`)
-    const result = await response.json()
+    const result = await fetchColumnar<Metric>(`${API_BASE}/anomalies`, "anomalies")
     if (result.status === 'success') {
-      setAnomalies(result.anomalies || [])
+      setAnomalies(result.rows)
     }
   } catch (error) {
     console.error("Failed to fetch anomalies:", error)
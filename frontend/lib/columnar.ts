@@ -0,0 +1,27 @@
+// Column-oriented responses from the API (?format=columnar): one array per field
+export type Columns = Record<string, unknown[]>
+
+export function columnsToRows<T>(columns: Columns | undefined): T[] {
+  if (!columns) return []
+
+  const names = Object.keys(columns)
+  const length = names.length > 0 ? columns[names[0]].length : 0
+  const rows = new Array<T>(length)
+
+  for (let i = 0; i < length; i++) {
+    const row: Record<string, unknown> = {}
+    for (const name of names) {
+      row[name] = columns[name][i]
+    }
+    rows[i] = row as T
+  }
+  return rows
+}
+
+// Fetch a list endpoint in columnar form (the browser handles gzip/zstd decoding)
+export async function fetchColumnar<T>(url: string, key: string): Promise<{ status: string; rows: T[] }> {
+  const separator = url.includes("?") ? "&" : "?"
+  const response = await fetch(`${url}${separator}format=columnar`)
+  const result = await response.json()
+  return { status: result.status, rows: columnsToRows<T>(result[key]) }
+}
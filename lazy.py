@@ -0,0 +1,28 @@
+# lazy.py - Deferred imports for heavy modules (pandas, numpy, sklearn)
+
+import importlib
+import threading
+
+class LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access.
+    Usage: pd = LazyModule('pandas') ... pd.read_csv(...)
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        module = self._module or self._load()
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<LazyModule '{self._name}' ({state})>"
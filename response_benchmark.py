@@ -0,0 +1,103 @@
+# response_benchmark.py - Compares payload size and serialization time per response format
+
+import argparse
+import gzip
+import json
+import random
+import statistics
+import time
+import pandas as pd
+import config
+from response_format import columnar_json, arrow_stream, UnsupportedFormat
+
+def make_metrics(num_rows):
+    """
+    Synthetic metrics shaped like the collector's output
+    """
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2025-01-01', periods=num_rows, freq='min').strftime('%Y-%m-%d %H:%M:%S'),
+        'instance_id': [f'instance-{i % config.NUM_SIMULATED_INSTANCES + 1}' for i in range(num_rows)],
+        'cpu_usage': [round(random.uniform(20, 60), 2) for _ in range(num_rows)],
+        'memory_usage': [round(random.uniform(30, 70), 2) for _ in range(num_rows)],
+        'network_traffic': [round(random.uniform(100, 500), 2) for _ in range(num_rows)]
+    })
+
+def records_json(df, key, meta):
+    """
+    The original format: one dict per row
+    """
+    payload = dict(meta)
+    payload[key] = df.to_dict('records')
+    return json.dumps(payload).encode('utf-8')
+
+def _timed(func, repeats):
+    """
+    Run func repeatedly; return (last result, median milliseconds)
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(times)
+
+def run(num_rows, repeats=5):
+    """
+    Serialize the same dataframe in every format / encoding and report size and time
+    """
+    df = make_metrics(num_rows)
+    meta = {'status': 'success', 'total_records': num_rows}
+
+    serializers = {
+        'records': lambda: records_json(df, 'metrics', meta),
+        'columnar': lambda: columnar_json(df, 'metrics', meta),
+        'arrow': lambda: arrow_stream(df, meta)
+    }
+
+    encoders = {'identity': lambda body: body,
+                'gzip': lambda body: gzip.compress(body, compresslevel=config.GZIP_LEVEL)}
+    try:
+        import zstandard
+        compressor = zstandard.ZstdCompressor(level=config.ZSTD_LEVEL)
+        encoders['zstd'] = compressor.compress
+    except ImportError:
+        pass
+
+    results = []
+    for name, serialize in serializers.items():
+        try:
+            body, serialize_ms = _timed(serialize, repeats)
+        except UnsupportedFormat as e:
+            print(f"   ⚠️  Skipping {name}: {e}")
+            continue
+
+        for encoding, encode in encoders.items():
+            encoded, encode_ms = _timed(lambda: encode(body), repeats)
+            results.append({
+                'format': name,
+                'encoding': encoding,
+                'bytes': len(encoded),
+                'serialize_ms': round(serialize_ms, 2),
+                'encode_ms': round(encode_ms, 2),
+                'total_ms': round(serialize_ms + encode_ms, 2)
+            })
+
+    return results
+
+# Run the benchmark
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare response formats for bulk metric transfer')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"📦 Response format benchmark ({args.rows} rows, median of {args.repeats})")
+    results = run(args.rows, args.repeats)
+
+    baseline = next(r for r in results if r['format'] == 'records' and r['encoding'] == 'identity')
+    print("=" * 78)
+    print(f"   {'format':<10}{'encoding':<10}{'bytes':>12}{'vs records':>12}{'serialize ms':>14}{'total ms':>12}")
+    for r in results:
+        ratio = r['bytes'] / baseline['bytes']
+        print(f"   {r['format']:<10}{r['encoding']:<10}{r['bytes']:>12}{ratio:>11.1%}"
+              f"{r['serialize_ms']:>14}{r['total_ms']:>12}")
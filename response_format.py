@@ -0,0 +1,181 @@
+# response_format.py - Content negotiation for bulk metric responses
+
+import gzip
+import importlib
+import json
+from flask import Response, jsonify
+import config
+from lazy import LazyModule
+
+np = LazyModule('numpy')
+
+# Media types clients can ask for in the Accept header (or with ?format=)
+FORMATS = {
+    'records': 'application/json',
+    'columnar': 'application/vnd.cloudsentinel.columnar+json',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+class UnsupportedFormat(Exception):
+    """
+    Requested format can't be produced (e.g. optional dependency missing)
+    """
+    pass
+
+def _optional_import(name):
+    """
+    Import an optional dependency, or return None if it isn't installed
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+def _require_pyarrow():
+    """
+    pyarrow, or UnsupportedFormat (406) if it isn't installed
+    """
+    pa = _optional_import('pyarrow')
+    if pa is None:
+        raise UnsupportedFormat('Arrow format requires pyarrow (pip install pyarrow)')
+    return pa
+
+def negotiate_format(request):
+    """
+    Pick the response format: ?format= wins, then the Accept header, else records.
+    Raises UnsupportedFormat up front, so endpoints can reject before doing the work.
+    """
+    requested = request.args.get('format')
+    if requested:
+        if requested not in FORMATS:
+            raise UnsupportedFormat(f"Unknown format '{requested}' (use {', '.join(FORMATS)})")
+        fmt = requested
+    else:
+        accept = request.headers.get('Accept', '')
+        fmt = next((name for name in ['arrow', 'columnar'] if FORMATS[name] in accept), 'records')
+
+    if fmt == 'arrow':
+        _require_pyarrow()
+    return fmt
+
+def _accepted_encodings(request):
+    """
+    Encodings from Accept-Encoding mapped to their q-values (q=0 = not acceptable)
+    """
+    encodings = {}
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        name, *params = part.split(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        encodings[name] = q
+    return encodings
+
+def _choose_encoding(request):
+    """
+    The supported encoding with the highest q-value (zstd wins ties), or None
+    when the client prefers identity or accepts neither
+    """
+    accepted = _accepted_encodings(request)
+    wildcard = accepted.get('*', 0.0)
+
+    candidates = ['zstd', 'gzip'] if _optional_import('zstandard') is not None else ['gzip']
+    best, best_q = None, 0.0
+    for name in candidates:
+        q = accepted.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+
+    if accepted.get('identity', 0.0) > best_q:
+        return None
+    return best
+
+def _column_values(series):
+    """
+    A column as a JSON-ready list, built from the NumPy buffer (NaN -> null)
+    """
+    values = series.to_numpy()
+    missing = series.isna().to_numpy()
+    if missing.any():
+        values = np.where(missing, None, values.astype(object))
+    return values.tolist()
+
+def _records(df):
+    """
+    One dict per row, with missing values as None (NaN isn't valid JSON)
+    """
+    if df.isna().to_numpy().any():
+        df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
+
+def columnar_json(df, key, meta):
+    """
+    Serialize as {..meta, key: {column: [values]}} - one array per field, no per-row dicts
+    """
+    payload = dict(meta)
+    payload['format'] = 'columnar'
+    payload[key] = {col: _column_values(df[col]) for col in df.columns}
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+def arrow_stream(df, meta):
+    """
+    Serialize as an Arrow IPC stream (meta goes in the schema metadata)
+    """
+    pa = _require_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({'cloudsentinel': json.dumps(meta)})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as stream_writer:
+        stream_writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def compress(response, request):
+    """
+    gzip/zstd-encode a response body when the client accepts it and it's big enough.
+    The encoding follows the client's q-values.
+    """
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+
+    body = response.get_data()
+    if len(body) < config.COMPRESSION_MIN_BYTES:
+        return response
+
+    encoding = _choose_encoding(request)
+    if encoding == 'zstd':
+        body = _optional_import('zstandard').ZstdCompressor(level=config.ZSTD_LEVEL).compress(body)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=config.GZIP_LEVEL)
+    else:
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def dataframe_response(df, key, meta, request):
+    """
+    Build the response for a dataframe in the negotiated format
+    meta holds the other top-level fields (status, counts, ...)
+    """
+    fmt = negotiate_format(request)
+
+    if fmt == 'records':
+        payload = dict(meta)
+        payload[key] = _records(df)
+        response = jsonify(payload)
+    elif fmt == 'columnar':
+        response = Response(columnar_json(df, key, meta), mimetype=FORMATS['columnar'])
+    else:
+        response = Response(arrow_stream(df, meta), mimetype=FORMATS['arrow'])
+
+    return compress(response, request)
@@ -0,0 +1,304 @@
+# retention_manager.py - Retention, compaction and downsampling of metrics history
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import config
+import storage
+from lazy import LazyModule
+
+pd = LazyModule('pandas')
+
+METRIC_COLUMNS = ['cpu_usage', 'memory_usage', 'network_traffic']
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+class RetentionManager:
+    def __init__(self):
+        self.raw_ttl = timedelta(hours=config.RAW_RETENTION_HOURS)
+        self.hourly_ttl = timedelta(days=config.HOURLY_RETENTION_DAYS)
+        self.daily_ttl = timedelta(days=config.DAILY_RETENTION_DAYS)
+        self.interval = config.RETENTION_INTERVAL
+        self.last_report = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._run_lock = threading.Lock()  # Only one compaction at a time (in this process)
+
+    def _file_size(self, filename):
+        """
+        Size of a file in bytes (0 if missing)
+        """
+        return os.path.getsize(filename) if os.path.exists(filename) else 0
+
+    def _timed_read(self, filename):
+        """
+        Read a CSV and return (dataframe, milliseconds taken)
+        """
+        if not os.path.exists(filename):
+            return None, 0.0
+
+        start = time.perf_counter()
+        df = storage.read_csv(filename)
+        return df, (time.perf_counter() - start) * 1000
+
+    def _aggregate(self, df, freq):
+        """
+        Downsample samples into per-instance buckets of the given frequency
+        ('h' = hourly, 'D' = daily). Accepts raw rows or existing aggregates.
+        """
+        df = df.copy()
+        df['timestamp'] = pd.to_datetime(df['timestamp']).dt.floor(freq)
+
+        # Raw rows count as a single sample whose max is the value itself
+        if 'sample_count' not in df.columns:
+            df['sample_count'] = 1
+            for col in METRIC_COLUMNS:
+                df[f'{col}_max'] = df[col]
+
+        # Weighted sums so buckets can be merged without losing precision
+        for col in METRIC_COLUMNS:
+            df[col] = df[col] * df['sample_count']
+
+        agg = {col: 'sum' for col in METRIC_COLUMNS}
+        agg.update({f'{col}_max': 'max' for col in METRIC_COLUMNS})
+        agg['sample_count'] = 'sum'
+
+        result = df.groupby(['timestamp', 'instance_id'], as_index=False).agg(agg)
+        for col in METRIC_COLUMNS:
+            result[col] = (result[col] / result['sample_count']).round(2)
+
+        result['timestamp'] = result['timestamp'].dt.strftime(TIMESTAMP_FORMAT)
+        return result
+
+    def _merge_into(self, new_rows, filename, freq):
+        """
+        Merge aggregate rows into an aggregate file, combining duplicate buckets
+        """
+        with storage.locked(filename, exclusive=True):
+            try:
+                existing = pd.read_csv(filename)
+                combined = pd.concat([existing, new_rows], ignore_index=True)
+            except FileNotFoundError:
+                combined = new_rows
+
+            merged = self._aggregate(combined, freq)
+            storage.atomic_write(filename, lambda f: merged.to_csv(f, index=False))
+        return merged
+
+    def _split_by_age(self, df, cutoff):
+        """
+        Split a dataframe into (older than cutoff, cutoff or newer)
+        """
+        timestamps = pd.to_datetime(df['timestamp'])
+        old_mask = timestamps < cutoff
+        return df[old_mask], df[~old_mask]
+
+    def _trim(self, filename, cutoff):
+        """
+        Remove rows older than cutoff from a file and return them.
+        The file is locked only for the read and the atomic rewrite.
+        """
+        if not os.path.exists(filename):
+            return None
+
+        with storage.locked(filename, exclusive=True):
+            if not os.path.exists(filename):
+                return None
+            df = pd.read_csv(filename)
+            old, recent = self._split_by_age(df, cutoff)
+            if len(old) > 0:
+                storage.atomic_write(filename, lambda f: recent.to_csv(f, index=False))
+        return old
+
+    def _read_watermark(self, name):
+        """
+        Cutoff below which rows of a source were already merged into its aggregates
+        (called inside run(), which holds the watermark lock)
+        """
+        try:
+            with open(config.RETENTION_WATERMARK_FILE) as f:
+                value = json.load(f).get(name)
+        except FileNotFoundError:
+            return None
+        return None if value is None else datetime.strptime(value, TIMESTAMP_FORMAT)
+
+    def _write_watermark(self, name, cutoff):
+        """
+        Record that rows of a source older than cutoff are merged (never moves back)
+        """
+        try:
+            with open(config.RETENTION_WATERMARK_FILE) as f:
+                watermarks = json.load(f)
+        except FileNotFoundError:
+            watermarks = {}
+
+        previous = watermarks.get(name)
+        if previous is not None:
+            cutoff = max(cutoff, datetime.strptime(previous, TIMESTAMP_FORMAT))
+        watermarks[name] = cutoff.strftime(TIMESTAMP_FORMAT)
+        storage.atomic_write(config.RETENTION_WATERMARK_FILE, lambda f: json.dump(watermarks, f))
+
+    def _compact(self, source, target, cutoff, freq):
+        """
+        Roll rows of source older than cutoff up into target, then remove them.
+        The aggregates are written (and fsynced) before the source is trimmed, so
+        a failure in between can't lose samples; the watermark keeps a retry from
+        merging the same rows twice.
+        """
+        if not os.path.exists(source):
+            return 0, 0
+
+        old, _ = self._split_by_age(storage.read_csv(source), cutoff)
+        if len(old) == 0:
+            return 0, 0
+
+        watermark = self._read_watermark(source)
+        pending = old if watermark is None else old[pd.to_datetime(old['timestamp']) >= watermark]
+
+        written = 0
+        if len(pending) > 0:
+            aggregates = self._aggregate(pending, freq)
+            self._merge_into(aggregates, target, freq)
+            written = len(aggregates)
+        self._write_watermark(source, cutoff)
+
+        # Appends from the collector wait only while the source is rewritten
+        self._trim(source, cutoff)
+        return len(old), written
+
+    def compact_raw(self, now):
+        """
+        Move raw samples older than the raw TTL into hourly aggregates.
+        The cutoff is aligned to the hour so only complete buckets are compacted.
+        """
+        cutoff = (now - self.raw_ttl).replace(minute=0, second=0, microsecond=0)
+        return self._compact(config.DATA_FILE, config.HOURLY_FILE, cutoff, 'h')
+
+    def compact_hourly(self, now):
+        """
+        Move hourly aggregates older than the hourly TTL into daily aggregates
+        """
+        cutoff = (now - self.hourly_ttl).replace(hour=0, minute=0, second=0, microsecond=0)
+        return self._compact(config.HOURLY_FILE, config.DAILY_FILE, cutoff, 'D')
+
+    def expire_daily(self, now):
+        """
+        Drop daily aggregates older than the daily TTL
+        """
+        cutoff = now - self.daily_ttl
+
+        old = self._trim(config.DAILY_FILE, cutoff)
+        return 0 if old is None else len(old)
+
+    def expire_results(self, now):
+        """
+        Drop detector results older than the raw TTL, so results never
+        outlive the samples they were computed from
+        """
+        cutoff = (now - self.raw_ttl).replace(minute=0, second=0, microsecond=0)
+
+        old = self._trim(config.ANOMALIES_FILE, cutoff)
+        return 0 if old is None else len(old)
+
+    def run(self, now=None):
+        """
+        Run one full retention pass and return a report of what was reclaimed.
+        The pass holds an exclusive lock on the watermark file throughout, so
+        passes from other worker processes (or /retention/run) wait their turn
+        instead of merging the same rows twice.
+        """
+        now = now or datetime.now()
+        files = [config.DATA_FILE, config.ANOMALIES_FILE, config.HOURLY_FILE, config.DAILY_FILE]
+
+        with self._run_lock, storage.locked(config.RETENTION_WATERMARK_FILE, exclusive=True):
+            started = time.perf_counter()
+            bytes_before = sum(self._file_size(f) for f in files)
+            raw_before, read_before_ms = self._timed_read(config.DATA_FILE)
+
+            raw_compacted, hourly_written = self.compact_raw(now)
+            hourly_compacted, daily_written = self.compact_hourly(now)
+            daily_expired = self.expire_daily(now)
+            results_expired = self.expire_results(now)
+
+            bytes_after = sum(self._file_size(f) for f in files)
+            raw_after, read_after_ms = self._timed_read(config.DATA_FILE)
+
+            report = {
+                'timestamp': now.strftime(TIMESTAMP_FORMAT),
+                'raw_records_before': 0 if raw_before is None else len(raw_before),
+                'raw_records_after': 0 if raw_after is None else len(raw_after),
+                'raw_records_compacted': raw_compacted,
+                'hourly_buckets_written': hourly_written,
+                'hourly_buckets_compacted': hourly_compacted,
+                'daily_buckets_written': daily_written,
+                'daily_buckets_expired': daily_expired,
+                'results_expired': results_expired,
+                'bytes_before': bytes_before,
+                'bytes_after': bytes_after,
+                'bytes_reclaimed': bytes_before - bytes_after,
+                'read_latency_before_ms': round(read_before_ms, 2),
+                'read_latency_after_ms': round(read_after_ms, 2),
+                'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+            }
+            self.last_report = report
+
+        print(f"🧹 Retention: compacted {raw_compacted} raw records, "
+              f"reclaimed {report['bytes_reclaimed']} bytes")
+        return report
+
+    def _loop(self):
+        """
+        Background loop - runs a retention pass every interval until stopped.
+        The first pass waits one interval, so startup doesn't import pandas or
+        read the metrics CSV while the first requests are being served.
+        """
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run()
+            except Exception as e:
+                print(f"❌ Retention pass failed: {e}")
+
+    def start(self):
+        """
+        Start the background retention job (daemon thread)
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name='retention', daemon=True)
+        self._thread.start()
+        print(f"✅ Retention job started (every {self.interval}s)")
+
+    def stop(self):
+        """
+        Stop the background retention job
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get_settings(self):
+        """
+        Current retention configuration
+        """
+        return {
+            'raw_retention_hours': config.RAW_RETENTION_HOURS,
+            'hourly_retention_days': config.HOURLY_RETENTION_DAYS,
+            'daily_retention_days': config.DAILY_RETENTION_DAYS,
+            'interval_seconds': self.interval,
+            'running': self._thread is not None and self._thread.is_alive()
+        }
+
+# Run a retention pass once
+if __name__ == "__main__":
+    print("🧹 Running retention pass...")
+
+    manager = RetentionManager()
+    report = manager.run()
+
+    print("\n📊 Retention Report:")
+    for key, value in report.items():
+        print(f"   {key}: {value}")
@@ -0,0 +1,107 @@
+# startup_benchmark.py - Tracks import time and time to first response
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Modules whose import cost matters for cold starts
+ENTRY_POINTS = ['app', 'data_collector', 'anomaly_detector']
+
+# Start the app in a fresh interpreter and request /health once
+FIRST_RESPONSE_SCRIPT = """
+import app
+response = app.app.test_client().get('/health')
+assert response.status_code == 200
+"""
+
+def _run_python(args):
+    """
+    Run a fresh interpreter in the repo directory and return (stderr, seconds)
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + args, cwd=ROOT, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+
+    if result.returncode != 0:
+        raise RuntimeError(f"python {' '.join(args)} failed:\n{result.stderr}")
+    return result.stderr, elapsed
+
+def parse_importtime(output):
+    """
+    Parse `-X importtime` output into {module: (self_us, cumulative_us)}
+    """
+    timings = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+def measure_import(module):
+    """
+    Cumulative import time of a module (ms) and its slowest dependencies
+    """
+    output, _ = _run_python(['-X', 'importtime', '-c', f'import {module}'])
+    timings = parse_importtime(output)
+    slowest = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)[:5]
+
+    return {
+        'import_ms': round(timings[module][1] / 1000, 1),
+        'modules_imported': len(timings),
+        'slowest_self_ms': {name: round(t[0] / 1000, 1) for name, t in slowest},
+        'heavy_modules_loaded': [m for m in ['pandas', 'numpy', 'sklearn', 'boto3'] if m in timings]
+    }
+
+def measure_first_response():
+    """
+    Wall time from interpreter launch to the first /health response (ms)
+    """
+    _, elapsed = _run_python(['-c', FIRST_RESPONSE_SCRIPT])
+    return elapsed * 1000
+
+def run(repeats=5):
+    """
+    Run the benchmark and return a report (medians over repeats)
+    """
+    report = {'python': sys.version.split()[0], 'repeats': repeats, 'imports': {}}
+
+    for module in ENTRY_POINTS:
+        runs = [measure_import(module) for _ in range(repeats)]
+        result = runs[-1]
+        result['import_ms'] = statistics.median(r['import_ms'] for r in runs)
+        report['imports'][module] = result
+
+    baseline = statistics.median(_run_python(['-c', 'pass'])[1] * 1000 for _ in range(repeats))
+    first_response = statistics.median(measure_first_response() for _ in range(repeats))
+    report['interpreter_startup_ms'] = round(baseline, 1)
+    report['time_to_first_response_ms'] = round(first_response, 1)
+
+    return report
+
+# Run the benchmark
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure startup import time and time to first response')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    report = run(args.repeats)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print("⏱️  Startup Benchmark")
+        print("=" * 50)
+        for module, result in report['imports'].items():
+            heavy = ', '.join(result['heavy_modules_loaded']) or 'none'
+            print(f"   import {module}: {result['import_ms']} ms "
+                  f"({result['modules_imported']} modules, heavy: {heavy})")
+        print(f"   Interpreter startup: {report['interpreter_startup_ms']} ms")
+        print(f"   Time to first /health response: {report['time_to_first_response_ms']} ms")
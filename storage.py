@@ -0,0 +1,311 @@
+# storage.py - Coordinated reads and writes for CSV / model files
+
+import os
+import queue
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+import config
+from lazy import LazyModule
+
+pd = LazyModule('pandas')
+
+try:
+    import fcntl  # POSIX only - used to coordinate multiple worker processes
+except ImportError:
+    fcntl = None
+
+class ReadWriteLock:
+    """
+    Many readers or a single writer. Writers are preferred so a steady stream
+    of readers cannot starve them.
+    """
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+def _lock_for(filename):
+    """
+    In-process read/write lock for a file (one per path)
+    """
+    path = os.path.abspath(filename)
+    with _file_locks_guard:
+        if path not in _file_locks:
+            _file_locks[path] = ReadWriteLock()
+        return _file_locks[path]
+
+@contextmanager
+def locked(filename, exclusive=False):
+    """
+    Lock a data file for reading (shared) or writing (exclusive).
+    Threads are coordinated in-process; on POSIX an flock on '<file>.lock'
+    also coordinates other worker processes.
+    """
+    rw_lock = _lock_for(filename)
+    with (rw_lock.write() if exclusive else rw_lock.read()):
+        if fcntl is None:
+            yield
+            return
+
+        directory = os.path.dirname(filename) or '.'
+        os.makedirs(directory, exist_ok=True)
+        with open(filename + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _fsync_directory(directory):
+    """
+    Persist a rename in the directory entry (POSIX only)
+    """
+    if fcntl is None:
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def atomic_write(filename, write_func, mode='w'):
+    """
+    Write a file via a temp file + rename, so readers see the old or the new
+    file but never a truncated one. write_func receives the open temp file.
+    """
+    directory = os.path.dirname(filename) or '.'
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.basename(filename))
+    try:
+        with os.fdopen(fd, mode, newline='' if 'b' not in mode else None) as f:
+            write_func(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filename)
+        _fsync_directory(directory)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_csv(df, filename):
+    """
+    Atomically rewrite a CSV file
+    """
+    with locked(filename, exclusive=True):
+        atomic_write(filename, lambda f: df.to_csv(f, index=False))
+
+def read_csv(filename):
+    """
+    Read a CSV file without racing appends (raises FileNotFoundError like pandas)
+    """
+    with locked(filename):
+        return pd.read_csv(filename)
+
+def remove(filename):
+    """
+    Delete a data file if it exists
+    """
+    with locked(filename, exclusive=True):
+        if os.path.exists(filename):
+            os.remove(filename)
+
+class AppendWriter:
+    """
+    Single writer thread for CSV appends. Appends queued while a commit is in
+    progress are grouped, so many small appends cost one write and one fsync.
+    """
+    def __init__(self, window=config.GROUP_COMMIT_WINDOW):
+        self.window = window
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.commits = 0  # Number of fsyncs issued (for stats / stress test)
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='csv-writer', daemon=True)
+                self._thread.start()
+
+    def append(self, df, filename):
+        """
+        Queue rows for appending and block until they are committed to disk
+        """
+        done = threading.Event()
+        request = {'df': df, 'filename': filename, 'done': done, 'error': None}
+
+        self._ensure_started()
+        self._queue.put(request)
+        done.wait()
+
+        if request['error'] is not None:
+            raise request['error']
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+
+            # Give concurrent callers a moment to join this commit
+            if self.window:
+                time.sleep(self.window)
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            by_file = {}
+            for request in batch:
+                by_file.setdefault(request['filename'], []).append(request)
+
+            for filename, requests in by_file.items():
+                try:
+                    df = pd.concat([r['df'] for r in requests], ignore_index=True)
+                    self._commit(df, filename)
+                except Exception as e:
+                    for r in requests:
+                        r['error'] = e
+                for r in requests:
+                    r['done'].set()
+
+    def _commit(self, df, filename):
+        """
+        Append rows to a CSV with one write and one fsync
+        """
+        with locked(filename, exclusive=True):
+            existing_columns = None
+            if os.path.exists(filename) and os.path.getsize(filename) > 0:
+                existing_columns = pd.read_csv(filename, nrows=0).columns.tolist()
+
+            if existing_columns is None:
+                atomic_write(filename, lambda f: df.to_csv(f, index=False))
+            elif set(df.columns) - set(existing_columns):
+                # New columns - the header changes, so rewrite the whole file
+                combined = pd.concat([pd.read_csv(filename), df], ignore_index=True)
+                atomic_write(filename, lambda f: combined.to_csv(f, index=False))
+            else:
+                data = df.reindex(columns=existing_columns).to_csv(index=False, header=False)
+                with open(filename, 'a', newline='') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            self.commits += 1
+
+# Shared writer for the whole process
+writer = AppendWriter()
+
+def append_csv(df, filename):
+    """
+    Append rows to a CSV through the shared single writer
+    """
+    writer.append(df, filename)
+
+# Stress test: concurrent appends, rewrites and reads must not lose rows
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Concurrent write stress test')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--appends', type=int, default=50, help='Appends per thread')
+    parser.add_argument('--rows', type=int, default=3, help='Rows per append')
+    args = parser.parse_args()
+
+    print("🔨 Running concurrent write stress test...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, 'metrics.csv')
+        stop = threading.Event()
+        read_errors = []
+        rewrites = [0]
+
+        def appender(thread_id):
+            for i in range(args.appends):
+                rows = [{'timestamp': f'{thread_id}-{i}-{r}', 'instance_id': f'instance-{thread_id}',
+                         'cpu_usage': 1.0, 'memory_usage': 2.0, 'network_traffic': 3.0}
+                        for r in range(args.rows)]
+                append_csv(pd.DataFrame(rows), filename)
+
+        def rewriter():
+            # Simulates retention: read-modify-rewrite that keeps every row
+            while not stop.is_set():
+                with locked(filename, exclusive=True):
+                    if os.path.exists(filename):
+                        df = pd.read_csv(filename)
+                        atomic_write(filename, lambda f: df.to_csv(f, index=False))
+                        rewrites[0] += 1
+                time.sleep(0.01)
+
+        def reader():
+            while not stop.is_set():
+                try:
+                    df = read_csv(filename)
+                    if df.isna().any().any():
+                        read_errors.append('partial row read')
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    read_errors.append(str(e))
+
+        start = time.perf_counter()
+        background = [threading.Thread(target=rewriter)] + [threading.Thread(target=reader) for _ in range(2)]
+        appenders = [threading.Thread(target=appender, args=(t,)) for t in range(args.threads)]
+        for t in background + appenders:
+            t.start()
+        for t in appenders:
+            t.join()
+        stop.set()
+        for t in background:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        df = pd.read_csv(filename)
+        expected = args.threads * args.appends * args.rows
+        appends = args.threads * args.appends
+
+        print(f"   Rows expected: {expected}")
+        print(f"   Rows on disk:  {len(df)} ({df['timestamp'].nunique()} unique)")
+        print(f"   Appends: {appends} in {writer.commits} commits (fsyncs)")
+        print(f"   Rewrites: {rewrites[0]} | Read errors: {len(read_errors)}")
+        print(f"   Time: {elapsed:.2f}s")
+
+        assert len(df) == expected and df['timestamp'].nunique() == expected, "Rows were lost or duplicated!"
+        assert not read_errors, f"Readers saw inconsistent data: {read_errors[:3]}"
+        print("\n✅ Stress test passed - no rows lost!")